@@ -1,16 +1,16 @@
+import sys
 from typing import cast, TYPE_CHECKING
 
 from datetime import datetime, UTC
-from collections import deque, defaultdict
-from copy import copy
+from collections import defaultdict
 from bisect import insort, bisect_left
+from math import copysign, ceil, floor
 
 from ...core.module_property import module_property
 from ... import lib
 from .. import syminfo
 
 from ...types.strategy import QtyType
-from ...types.base import IntEnum
 from ...types.na import NA, na_float, na_str
 
 from . import direction as direction
@@ -38,14 +38,6 @@ if TYPE_CHECKING:
     from opentrades import opentrades
 
 
-#
-# Types
-#
-
-class _OrderType(IntEnum):
-    """ Order type """
-
-
 #
 # Constants
 #
@@ -57,10 +49,34 @@ percent_of_equity = QtyType("percent_of_equity")
 long = direction.long
 short = direction.short
 
-# Possible order types
-_order_type_normal = _OrderType()
-_order_type_entry = _OrderType()
-_order_type_close = _OrderType()
+# Possible order types - plain ints so the many per-fill comparisons stay on the
+# fast int == int path instead of going through an int subclass
+_order_type_normal = 0
+_order_type_entry = 1
+_order_type_close = 2
+
+# Trigger-mask bits - which price sweeps can possibly fill an order; derived from the
+# order's direction and from which prices are set, so the per-sweep eligibility checks
+# reduce to a single bitwise test
+_trig_high_stop = 1
+_trig_high_limit = 2
+_trig_low_stop = 4
+_trig_low_limit = 8
+_trig_high_trail = 16
+_trig_low_trail = 32
+
+# Anything that can act on the given sweep - orders without these bits are dead
+# for that price path and are skipped without testing each trigger kind
+_trig_high_any = _trig_high_stop | _trig_high_limit | _trig_high_trail
+_trig_low_any = _trig_low_stop | _trig_low_limit | _trig_low_trail
+
+# Interned prefix for exit ids generated by close()
+_close_exit_id_prefix = sys.intern("Close entry(s) order ")
+
+def _sign(x: float) -> float:
+    """ Sign of x as -1.0 / 0.0 / 1.0 """
+    return 0.0 if x == 0.0 else copysign(1.0, x)
+
 
 #
 # Imports after constants
@@ -85,10 +101,14 @@ class Order:
         "comment", "alert_message",
         "trail_price", "trail_offset",
         "trail_triggered",
+        "_trail_offset_price",  # Precomputed syminfo.mintick * trail_offset
+        "exit_direction",  # Direction of the position this order exits (+1 long / -1 short)
         "profit_ticks", "loss_ticks", "trail_points_ticks",  # Store tick values for later calculation
+        "_profit_offset", "_loss_offset", "_trail_points_offset",  # The same tick values as prices
         "is_market_order",  # Flag to check if this is a market order
         "cancelled",  # Flag to mark order as cancelled by OCA
         "bar_index",  # Bar index when the order was placed
+        "_trigger_mask",  # Which price sweeps can trigger this order (_trig_* bits)
     )
 
     def __init__(
@@ -96,7 +116,7 @@ class Order:
             order_id: str | None,
             size: float,
             *,
-            order_type: _OrderType = _order_type_normal,
+            order_type: int = _order_type_normal,
             exit_id: str | None = None,
             limit: float | None = None,
             stop: float | None = None,
@@ -112,7 +132,9 @@ class Order:
     ):
         self.order_id = order_id
         self.size = size
-        self.sign = 0.0 if size == 0.0 else 1.0 if size > 0.0 else -1.0
+        self.sign = _sign(size)
+        # An exit order's size is the negative of the position it closes
+        self.exit_direction = 1.0 if size < 0.0 else -1.0
         self.limit = limit
         self.stop = stop
         self.order_type = order_type
@@ -127,11 +149,18 @@ class Order:
 
         self.trail_price = trail_price
         self.trail_offset = trail_offset or 0  # in ticks
+        self._trail_offset_price = syminfo.mintick * self.trail_offset
         self.trail_triggered = False
 
         self.profit_ticks = profit_ticks
         self.loss_ticks = loss_ticks
         self.trail_points_ticks = trail_points_ticks
+        # Precompute the tick offsets as prices - mintick is constant for a run, so
+        # doing this here keeps the multiplications out of the per-bar recalculation
+        mintick = syminfo.mintick
+        self._profit_offset = mintick * profit_ticks if profit_ticks is not None else 0.0
+        self._loss_offset = mintick * loss_ticks if loss_ticks is not None else 0.0
+        self._trail_points_offset = mintick * trail_points_ticks if trail_points_ticks is not None else 0.0
 
         # Check if this is a market order (no limit, stop, or trail price)
         self.is_market_order = self.limit is None and self.stop is None
@@ -139,6 +168,66 @@ class Order:
         self.cancelled = False
         self.bar_index = -1  # Will be set when order is added to position
 
+        self._update_trigger_mask()
+
+    def _update_trigger_mask(self):
+        """
+        Recompute which price sweeps may trigger this order - call after size sign,
+        limit, stop or trail price changes
+        """
+        mask = 0
+        if self.size > 0.0:
+            if self.stop is not None:
+                mask |= _trig_high_stop
+            if self.limit is not None:
+                mask |= _trig_low_limit
+            if self.trail_price is not None:
+                mask |= _trig_low_trail
+        elif self.size < 0.0:
+            if self.stop is not None:
+                mask |= _trig_low_stop
+            if self.limit is not None:
+                mask |= _trig_high_limit
+            if self.trail_price is not None:
+                mask |= _trig_high_trail
+        self._trigger_mask = mask
+
+    def _clone(self) -> 'Order':
+        """
+        Fast copy of the order - like copy.copy(), but without its generic
+        __reduce_ex__ dispatch; used when a reversing order is split in two
+
+        :return: A new Order with the same field values
+        """
+        order = Order.__new__(Order)
+        order.order_id = self.order_id
+        order.size = self.size
+        order.sign = self.sign
+        order.exit_direction = self.exit_direction
+        order.order_type = self.order_type
+        order.limit = self.limit
+        order.stop = self.stop
+        order.exit_id = self.exit_id
+        order.oca_name = self.oca_name
+        order.oca_type = self.oca_type
+        order.comment = self.comment
+        order.alert_message = self.alert_message
+        order.trail_price = self.trail_price
+        order.trail_offset = self.trail_offset
+        order._trail_offset_price = self._trail_offset_price
+        order.trail_triggered = self.trail_triggered
+        order.profit_ticks = self.profit_ticks
+        order.loss_ticks = self.loss_ticks
+        order.trail_points_ticks = self.trail_points_ticks
+        order._profit_offset = self._profit_offset
+        order._loss_offset = self._loss_offset
+        order._trail_points_offset = self._trail_points_offset
+        order.is_market_order = self.is_market_order
+        order.cancelled = self.cancelled
+        order.bar_index = self.bar_index
+        order._trigger_mask = self._trigger_mask
+        return order
+
     def __repr__(self):
         return f"Order(order_id={self.order_id}; exit_id={self.exit_id}; size={self.size}; type: {self.order_type}; " \
                f"limit={self.limit}; stop={self.stop}; " \
@@ -156,14 +245,15 @@ class Trade:
         "exit_id", "exit_bar_index", "exit_time", "exit_price", "exit_comment", "exit_equity",
         "commission", "max_drawdown", "max_drawdown_percent", "max_runup", "max_runup_percent",
         "profit", "profit_percent", "cum_profit", "cum_profit_percent",
-        "cum_max_drawdown", "cum_max_runup"
+        "cum_max_drawdown", "cum_max_runup",
+        "_entry_time_dt", "_exit_time_dt"  # Cached (timestamp, datetime) pairs for get()
     )
 
     # noinspection PyShadowingNames
     def __init__(self, *, size: float, entry_id: str, entry_bar_index: int, entry_time: int, entry_price: float,
                  commission: float, entry_comment: str, entry_equity: float):
         self.size: float = size
-        self.sign = 0.0 if size == 0.0 else 1.0 if size > 0.0 else -1.0
+        self.sign = _sign(size)
 
         self.entry_id: str = entry_id
         self.entry_bar_index: int = entry_bar_index
@@ -193,11 +283,51 @@ class Trade:
         self.cum_max_drawdown: float | NA[float] = 0.0
         self.cum_max_runup: float | NA[float] = 0.0
 
+        self._entry_time_dt: tuple[int, datetime] | None = None
+        self._exit_time_dt: tuple[int, datetime] | None = None
+
     def __repr__(self):
         return f"Trade(entry_id={self.entry_id}; size={self.size}; entry_bar_index: {self.entry_bar_index}; " \
                f"entry_price={self.entry_price}; exit_price={self.exit_price}; commission={self.commission}; " \
                f"entry_equity={self.entry_equity}; exit_equity={self.exit_equity}"
 
+    def _clone(self) -> 'Trade':
+        """
+        Fast copy of the trade - like copy.copy(), but without its generic
+        __reduce_ex__ dispatch, which is measurable on strategies with many partial fills
+
+        :return: A new Trade with the same field values
+        """
+        trade = Trade.__new__(Trade)
+        trade.size = self.size
+        trade.sign = self.sign
+        trade.entry_id = self.entry_id
+        trade.entry_bar_index = self.entry_bar_index
+        trade.entry_time = self.entry_time
+        trade.entry_price = self.entry_price
+        trade.entry_comment = self.entry_comment
+        trade.entry_equity = self.entry_equity
+        trade.exit_id = self.exit_id
+        trade.exit_bar_index = self.exit_bar_index
+        trade.exit_time = self.exit_time
+        trade.exit_price = self.exit_price
+        trade.exit_comment = self.exit_comment
+        trade.exit_equity = self.exit_equity
+        trade.commission = self.commission
+        trade.max_drawdown = self.max_drawdown
+        trade.max_drawdown_percent = self.max_drawdown_percent
+        trade.max_runup = self.max_runup
+        trade.max_runup_percent = self.max_runup_percent
+        trade.profit = self.profit
+        trade.profit_percent = self.profit_percent
+        trade.cum_profit = self.cum_profit
+        trade.cum_profit_percent = self.cum_profit_percent
+        trade.cum_max_drawdown = self.cum_max_drawdown
+        trade.cum_max_runup = self.cum_max_runup
+        trade._entry_time_dt = self._entry_time_dt
+        trade._exit_time_dt = self._exit_time_dt
+        return trade
+
     #
     # Support csv.DictWriter
     #
@@ -208,12 +338,72 @@ class Trade:
     def get(self, key: str, default=None):
         v = getattr(self, key, default)
         if key in ('entry_time', 'exit_time'):
-            v = datetime.fromtimestamp(v / 1000.0, tz=UTC)
+            # Cache the converted datetime - constructing it is pure overhead when
+            # the same trade is exported more than once
+            cached = self._entry_time_dt if key == 'entry_time' else self._exit_time_dt
+            if cached is None or cached[0] != v:
+                cached = (v, datetime.fromtimestamp(v / 1000.0, tz=UTC))
+                if key == 'entry_time':
+                    self._entry_time_dt = cached
+                else:
+                    self._exit_time_dt = cached
+            v = cached[1]
         elif isinstance(v, float):
             v = round(v, 10)
         return v
 
 
+class ClosedTradesRing:
+    """
+    Bounded storage for closed trades with O(1) random access.
+
+    Behaves like deque(maxlen=cap) - the oldest trade is dropped once the capacity
+    is reached - but indexing is O(1) instead of O(n), which the
+    strategy.closedtrades.* accessors rely on for every per-bar lookup.
+    """
+
+    __slots__ = ('_trades', '_start', '_cap')
+
+    def __init__(self, cap: int = 9000):
+        self._trades: list[Trade] = []
+        self._start = 0  # Index of the oldest trade once the ring has wrapped
+        self._cap = cap
+
+    def append(self, trade: Trade):
+        """ Append a trade, dropping the oldest one when the ring is full """
+        trades = self._trades
+        if len(trades) < self._cap:
+            trades.append(trade)
+        else:
+            start = self._start
+            trades[start] = trade
+            self._start = start + 1 if start + 1 < self._cap else 0
+
+    def __len__(self) -> int:
+        return len(self._trades)
+
+    def __getitem__(self, index: int) -> Trade:
+        trades = self._trades
+        n = len(trades)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("trade index out of range")
+        index += self._start
+        if index >= n:
+            index -= n
+        return trades[index]
+
+    def __iter__(self):
+        trades = self._trades
+        start = self._start
+        if start:
+            yield from trades[start:]
+            yield from trades[:start]
+        else:
+            yield from trades
+
+
 # noinspection PyShadowingNames
 class PriceOrderBook:
     """
@@ -280,6 +470,7 @@ class PriceOrderBook:
 
         # Update the order's stop price
         order.stop = new_stop
+        order._update_trigger_mask()
 
         # Add the order to the new stop price level
         if new_stop not in self.orders_at_price:
@@ -368,12 +559,12 @@ class Position:
         'h', 'l', 'c', 'o',
         'netprofit', 'openprofit', 'grossprofit', 'grossloss',
         'entry_orders', 'exit_orders', 'market_orders', 'orderbook',
-        'open_trades', 'closed_trades', 'new_closed_trades',
+        'open_trades', 'closed_trades', 'new_closed_trades', '_trades_by_entry_id',
         'closed_trades_count', 'wintrades', 'eventrades', 'losstrades',
         'size', 'sign', 'avg_price', 'cum_profit',
         'entry_equity', 'max_equity', 'min_equity',
         'drawdown_summ', 'runup_summ', 'max_drawdown', 'max_runup',
-        'entry_summ', 'open_commission',
+        'entry_summ', 'open_commission', '_size_rfactor', '_has_tick_exit_orders',
         'risk_allowed_direction', 'risk_max_cons_loss_days', 'risk_max_cons_loss_days_alert',
         'risk_max_drawdown_value', 'risk_max_drawdown_type', 'risk_max_drawdown_alert',
         'risk_max_intraday_filled_orders', 'risk_max_intraday_filled_orders_alert',
@@ -404,8 +595,10 @@ class Position:
 
         # Trades
         self.open_trades: list[Trade] = []
-        self.closed_trades: deque[Trade] = deque(maxlen=9000)  # 9000 is the limit of TV
+        self.closed_trades = ClosedTradesRing(9000)  # 9000 is the limit of TV
         self.new_closed_trades: list[Trade] = []
+        # Open trades grouped by entry id for O(1) lookup of targeted exits
+        self._trades_by_entry_id: dict[str, list[Trade]] = {}
 
         # Trade statistics
         self.closed_trades_count: int = 0
@@ -425,6 +618,12 @@ class Position:
         self.max_runup: float = 0.0
         self.entry_summ: float = 0.0
         self.open_commission: float = 0.0
+        # Cached syminfo._size_round_factor - syminfo is not populated yet when the
+        # position is created, so it is (re)read once per bar in process_orders
+        self._size_rfactor: float = 0.0
+        # Whether any exit order was placed with tick-based targets - sticky flag used
+        # to skip the per-bar recalculation loop for price-based strategies
+        self._has_tick_exit_orders: bool = False
 
         # Risk management settings
         self.risk_allowed_direction: direction.Direction | None = None
@@ -494,14 +693,8 @@ class Position:
 
     def _remove_order_by_id(self, order_id: str):
         """ Remove order by id """
-        # First check in exit orders
-        order = self.exit_orders.get(order_id)
-        if order:
-            self._remove_order(order)
-            return
-
-        # Then check in entry orders
-        order = self.entry_orders.get(order_id)
+        # Exit orders first, then entry orders
+        order = self.exit_orders.get(order_id) or self.entry_orders.get(order_id)
         if order:
             self._remove_order(order)
 
@@ -556,6 +749,7 @@ class Position:
         script = lib._script
         commission_type = script.commission_type
         commission_value = script.commission_value
+        initial_capital = script.initial_capital
 
         new_closed_trades = []
         closed_trade_size = 0.0
@@ -564,20 +758,48 @@ class Position:
         if self.size and order.sign != self.sign:
             delete = False
 
-            # Check list of open trades
-            new_open_trades = []
-            for trade in self.open_trades:
+            # Bind loop-invariant values to locals - this loop runs for every (partial) fill,
+            # and attribute lookups inside it are pure interpreter overhead
+            order_id = order.order_id
+            order_is_close = order.order_type == _order_type_close
+            order_exit_id = order.exit_id if order.exit_id is not None else order_id
+            exit_bar_index = int(lib.bar_index)
+            exit_time = lib._time
+            closed_trades_append = self.closed_trades.append
+            rfactor = self._size_rfactor
+            if rfactor == 0.0:
+                rfactor = self._size_rfactor = syminfo._size_round_factor
+
+            # Check list of open trades - compacted in place with a write index instead of
+            # rebuilding the list, as most fills leave the list contents unchanged.
+            # Skipped entirely when the order has no size left to fill.
+            open_trades = self.open_trades
+            n = len(open_trades) if order.size != 0.0 else 0
+            # A close order targeting a specific entry can only match the trades indexed
+            # under that entry id - skip the scan when there are none, and stop it as
+            # soon as all of them have been seen
+            if order_is_close and order_id is not None:
+                candidates = self._trades_by_entry_id.get(order_id)
+                remaining = len(candidates) if candidates else 0
+                if not remaining:
+                    n = 0
+            else:
+                remaining = -1
+            w = 0
+            for r in range(n):
+                trade = open_trades[r]
                 # Only use if its order id is the same
-                if order.size != 0.0 and ((trade.entry_id == order.order_id and order.order_type == _order_type_close)
-                                          or order.order_type != _order_type_close
-                                          or order.order_id is None):
+                if order.size != 0.0 and ((trade.entry_id == order_id and order_is_close)
+                                          or not order_is_close
+                                          or order_id is None):
                     delete = True
+                    remaining -= 1
 
                     size = order.size if abs(order.size) <= abs(trade.size) else -trade.size
                     pnl = -size * (price - trade.entry_price)
 
                     # Copy and modify actual trade, because it can be partially filled
-                    closed_trade = copy(trade)
+                    closed_trade = trade._clone()
 
                     size_ratio = 1 + size / closed_trade.size
                     if closed_trade.size != -size:
@@ -594,23 +816,26 @@ class Position:
                     hprofit = (-size * (h - closed_trade.entry_price) - closed_trade.commission)
                     lprofit = (-size * (l - closed_trade.entry_price) - closed_trade.commission)
 
-                    # Drawdown and runup
-                    drawdown = -min(hprofit, lprofit, 0.0)
-                    runup = max(hprofit, lprofit, 0.0)
+                    # Drawdown and runup - ternaries instead of variadic min()/max(),
+                    # which pay iterator-protocol overhead on every call
+                    lo = hprofit if hprofit < lprofit else lprofit
+                    hi = hprofit if hprofit > lprofit else lprofit
+                    drawdown = -lo if lo < 0.0 else 0.0
+                    runup = hi if hi > 0.0 else 0.0
                     # Drawdown summ runup summ
                     self.drawdown_summ += drawdown
                     self.runup_summ += runup
 
                     closed_trade.size = -size
-                    closed_trade.exit_id = order.exit_id if order.exit_id is not None else order.order_id
-                    closed_trade.exit_bar_index = int(lib.bar_index)
-                    closed_trade.exit_time = lib._time
+                    closed_trade.exit_id = order_exit_id
+                    closed_trade.exit_bar_index = exit_bar_index
+                    closed_trade.exit_time = exit_time
                     closed_trade.exit_price = price
                     closed_trade.profit = pnl
 
                     # Add to closed trade
                     new_closed_trades.append(closed_trade)
-                    self.closed_trades.append(closed_trade)
+                    closed_trades_append(closed_trade)
                     self.closed_trades_count += 1
 
                     if order.comment:
@@ -640,11 +865,9 @@ class Position:
 
                     # Profit percent
                     entry_value = abs(closed_trade.size) * closed_trade.entry_price
-                    try:
-                        # Use closed_trade.profit which includes commission, not pnl which doesn't
-                        closed_trade.profit_percent = (closed_trade.profit / entry_value) * 100.0
-                    except ZeroDivisionError:
-                        closed_trade.profit_percent = 0.0
+                    # Use closed_trade.profit which includes commission, not pnl which doesn't
+                    closed_trade.profit_percent = \
+                        (closed_trade.profit / entry_value) * 100.0 if entry_value else 0.0
 
                     # Realize profit or loss
                     self.netprofit += pnl
@@ -652,10 +875,11 @@ class Position:
                     # Modify sizes
                     self.size += size
                     # Handle too small sizes because of floating point inaccuracy and rounding
-                    if _size_round(self.size) == 0.0:
+                    # (inline equivalent of _size_round(self.size) == 0.0)
+                    if abs(self.size) * rfactor * 10.0 < 10.0:
                         size -= self.size
                         self.size = 0.0
-                    self.sign = 0.0 if self.size == 0.0 else 1.0 if self.size > 0.0 else -1.0
+                    self.sign = _sign(self.size)
                     trade.size += size
                     order.size -= size
 
@@ -692,11 +916,12 @@ class Position:
                         self.avg_price = na_float
                         self.openprofit = 0.0
 
-                    # Exit equity
-                    closed_trade.exit_equity = self.equity
+                    # Exit equity - computed from locals instead of the equity property
+                    closed_trade.exit_equity = initial_capital + self.netprofit + self.openprofit
 
                     # Remove from open trades if it is fully filled
                     if trade.size == 0.0:
+                        self._trades_by_entry_id[trade.entry_id].remove(trade)
                         continue
 
                     if pnl > 0.0:
@@ -705,19 +930,29 @@ class Position:
                         self.drawdown_summ += closed_trade.commission / 2
                         self.entry_equity += closed_trade.commission / 2
 
-                new_open_trades.append(trade)
+                open_trades[w] = trade
+                w += 1
 
-            self.open_trades = new_open_trades
+                # Once the order is fully filled or all indexed candidates have been seen,
+                # no further trade can match; if nothing has been removed so far the tail
+                # is already in place, so stop scanning
+                if (order.size == 0.0 or remaining == 0) and w == r + 1:
+                    w = n
+                    break
+
+            if n:
+                del open_trades[w:]
 
             if delete:
                 self._remove_order(order)
 
                 if commission_type == _commission.cash_per_order:
-                    # Realize commission
+                    # Realize commission, split across the closed trades by size
                     self.netprofit -= commission_value
-                    for trade in new_closed_trades:
-                        commission = (commission_value * abs(trade.size)) / closed_trade_size
-                        trade.commission += commission
+                    if new_closed_trades:
+                        commission_per_size = commission_value / closed_trade_size
+                        for trade in new_closed_trades:
+                            trade.commission += commission_per_size * abs(trade.size)
 
             self.new_closed_trades.extend(new_closed_trades)
 
@@ -736,12 +971,12 @@ class Position:
             else:
                 commission = 0.0
 
-            before_equity = self.equity
+            before_equity = initial_capital + self.netprofit + self.openprofit
 
             # Realize commission
             self.netprofit -= commission
 
-            entry_equity = self.equity
+            entry_equity = before_equity - commission
             if not self.open_trades:
                 # Set max and min equity
                 self.max_equity = max(self.max_equity, entry_equity)
@@ -760,15 +995,13 @@ class Position:
             )
 
             self.open_trades.append(trade)
+            self._trades_by_entry_id.setdefault(trade.entry_id, []).append(trade)
             self.size += trade.size
-            self.sign = 0.0 if self.size == 0.0 else 1.0 if self.size > 0.0 else -1.0
+            self.sign = _sign(self.size)
 
             # Average entry price
             self.entry_summ += price * abs(order.size)
-            try:
-                self.avg_price = self.entry_summ / abs(self.size)
-            except ZeroDivisionError:
-                self.avg_price = na_float
+            self.avg_price = self.entry_summ / abs(self.size) if self.size else na_float
             # Unrealized P&L
             self.openprofit = self.size * (self.c - self.avg_price)
             # Commission summ
@@ -784,6 +1017,7 @@ class Position:
             self.avg_price = na_float
             self.openprofit = 0.0
             self.open_commission = 0.0
+            self._trades_by_entry_id.clear()
 
             # Cancel all exit orders when position is closed (TradingView behavior)
             # Exit orders without from_entry are canceled when position is flat
@@ -864,9 +1098,13 @@ class Position:
         # This is necessary to create a new average entry price
         # Note: The flip quantity is already calculated in entry() for entry orders
         new_size = self.size + order.size
-        if _size_round(new_size) == 0.0:
+        rfactor = self._size_rfactor
+        if rfactor == 0.0:
+            rfactor = self._size_rfactor = syminfo._size_round_factor
+        # Inline equivalent of _size_round(new_size) == 0.0
+        if abs(new_size) * rfactor * 10.0 < 10.0:
             new_size = 0.0
-        new_sign = 0.0 if new_size == 0.0 else 1.0 if new_size > 0.0 else -1.0
+        new_sign = _sign(new_size)
         if self.size != 0.0 and new_sign != self.sign and new_size != 0.0:
             # Exit orders should never reverse position direction
             # Only entry orders can open new positions or reverse direction
@@ -877,7 +1115,7 @@ class Position:
                 return False
 
             # Create a copy for closing existing position
-            order1 = copy(order)
+            order1 = order._clone()
             order1.order_type = _order_type_close
             order1.size = -self.size
             # Set order_id to None so it will close any open trades
@@ -944,56 +1182,53 @@ class Position:
         :param order: The order to check
         :return: True if the order should be filled immediately at open price
         """
+        mask = order._trigger_mask
+
         # Check stop orders with gaps
-        if order.stop is not None:
-            # Long stop order (size > 0): triggers if open gaps above stop level
-            if order.size > 0 and self.o >= order.stop:
-                return True
-            # Short stop order (size < 0): triggers if open gaps below stop level
-            if order.size < 0 and self.o <= order.stop:
-                return True
+        # Long stop order (size > 0): triggers if open gaps above stop level
+        if mask & _trig_high_stop and self.o >= order.stop:
+            return True
+        # Short stop order (size < 0): triggers if open gaps below stop level
+        if mask & _trig_low_stop and self.o <= order.stop:
+            return True
 
         # Check limit orders with gaps
-        if order.limit is not None:
-            # Long limit order (size > 0): triggers if open gaps below limit level
-            if order.size > 0 and self.o <= order.limit:
-                return True
-            # Short limit order (size < 0): triggers if open gaps above limit level
-            if order.size < 0 and self.o >= order.limit:
-                return True
+        # Long limit order (size > 0): triggers if open gaps below limit level
+        if mask & _trig_low_limit and self.o <= order.limit:
+            return True
+        # Short limit order (size < 0): triggers if open gaps above limit level
+        if mask & _trig_high_limit and self.o >= order.limit:
+            return True
 
         return False
 
     def _check_high_stop(self, order: Order) -> bool:
         """ Check high stop and trailing trigger """
-        if order.stop is None:
-            return False
         # Long stop order (size > 0) triggers when price rises to stop level
-        if order.size > 0 and order.stop <= self.h:
-            p = max(order.stop, self.o)
+        if order._trigger_mask & _trig_high_stop and order.stop <= self.h:
+            p = order.stop if order.stop > self.o else self.o
             self.fill_order(order, p, p, self.l)
             return True
         return False
 
     def _check_high(self, order: Order) -> bool:
         """ Check high limit """
-        if order.limit is not None:
-            # Short limit order (size < 0) triggers when price rises to limit level
-            if order.size < 0 and order.limit <= self.h:
-                p = max(order.limit, self.o)
-                self.fill_order(order, p, p, self.l)
-                return True
+        # Short limit order (size < 0) triggers when price rises to limit level
+        if order._trigger_mask & _trig_high_limit and order.limit <= self.h:
+            p = order.limit if order.limit > self.o else self.o
+            self.fill_order(order, p, p, self.l)
+            return True
         return False
 
     def _check_high_trailing(self, order: Order) -> bool:
         # Update trailing stop
-        if order.trail_price is not None and order.sign < 0:
+        if order._trigger_mask & _trig_high_trail:
             # Check if trailing price has been triggered
             if not order.trail_triggered and self.h > order.trail_price:
                 order.trail_triggered = True
             # Update stop if trailing price has been triggered
             if order.trail_triggered:
-                offset_price = syminfo.mintick * order.trail_offset
+                offset_price = order._trail_offset_price
                 new_stop = max(lib.math.round_to_mintick(self.h - offset_price), order.stop)  # type: ignore
                 if new_stop != order.stop:
                     # Update the order in the orderbook with the new stop price
@@ -1003,34 +1238,31 @@ class Position:
 
     def _check_low_stop(self, order: Order) -> bool:
         """ Check low stop """
-        if order.stop is None:
-            return False
         # Short stop order (size < 0) triggers when price falls to stop level
-        if order.size < 0 and order.stop >= self.l:
-            p = min(self.o, order.stop)
+        if order._trigger_mask & _trig_low_stop and order.stop >= self.l:
+            p = self.o if self.o < order.stop else order.stop
             self.fill_order(order, p, self.h, p)
             return True
         return False
 
     def _check_low(self, order: Order) -> bool:
         """ Check low limit """
-        if order.limit is not None:
-            # Long limit order (size > 0) triggers when price falls to limit level
-            if order.size > 0 and order.limit >= self.l:
-                p = min(self.o, order.limit)
-                self.fill_order(order, p, self.h, p)
-                return True
+        # Long limit order (size > 0) triggers when price falls to limit level
+        if order._trigger_mask & _trig_low_limit and order.limit >= self.l:
+            p = self.o if self.o < order.limit else order.limit
+            self.fill_order(order, p, self.h, p)
+            return True
         return False
 
     def _check_low_trailing(self, order: Order) -> bool:
         # Update trailing stop
-        if order.trail_price is not None and order.sign > 0:
+        if order._trigger_mask & _trig_low_trail:
             # Check if trailing price has been triggered
             if not order.trail_triggered and self.l < order.trail_price:
                 order.trail_triggered = True
             # Update stop if trailing price has been triggered
             if order.trail_triggered:
-                offset_price = syminfo.mintick * order.trail_offset
+                offset_price = order._trail_offset_price
                 new_stop = min(lib.math.round_to_mintick(self.l + offset_price), order.stop)  # type: ignore
                 if new_stop != order.stop:
                     # Update the order in the orderbook with the new stop price
@@ -1038,6 +1270,34 @@ class Position:
                 return True
         return False
 
+    def _sweep_high(self, ohlc: bool):
+        """ Check all orders on the open → high price path """
+        for order in self.orderbook.iter_orders(min_price=self.o, max_price=self.h):
+            if not order._trigger_mask & _trig_high_any:
+                continue
+            if self._check_high_stop(order):
+                continue
+            if self._check_high(order):
+                continue
+            if self._check_high_trailing(order):
+                continue
+            if order.trail_triggered and order.stop is not None:
+                self._check_close(order, ohlc)
+
+    def _sweep_low(self, ohlc: bool):
+        """ Check all orders on the open → low price path """
+        for order in self.orderbook.iter_orders(max_price=self.o, min_price=self.l):
+            if not order._trigger_mask & _trig_low_any:
+                continue
+            if self._check_low_stop(order):
+                continue
+            if self._check_low(order):
+                continue
+            if self._check_low_trailing(order):
+                continue
+            if order.trail_triggered and order.stop is not None:
+                self._check_close(order, ohlc)
+
     def _check_close(self, order: Order, ohlc: bool) -> bool:
         """ Check close price if trailing stop is triggered """
         if order.stop is None:
@@ -1054,12 +1314,18 @@ class Position:
 
     def process_orders(self):
         """ Process orders """
-        # We need to round to the nearest tick to get the same results as in TradingView
-        round_to_mintick = lib.math.round_to_mintick
-        self.o = round_to_mintick(lib.open)
-        self.h = round_to_mintick(lib.high)
-        self.l = round_to_mintick(lib.low)
-        self.c = round_to_mintick(lib.close)
+        # We need to round to the nearest tick to get the same results as in TradingView.
+        # math.round_to_mintick is inlined here: one pricescale lookup and no call frame
+        # per price instead of four.
+        # Keep the rounded values in locals too - they are re-read many times per bar below
+        pricescale = syminfo.pricescale
+        o = self.o = int(lib.open * pricescale + 0.5) / pricescale
+        h = self.h = int(lib.high * pricescale + 0.5) / pricescale
+        l = self.l = int(lib.low * pricescale + 0.5) / pricescale  # noqa: E741
+        self.c = int(lib.close * pricescale + 0.5) / pricescale
+
+        # Refresh the cached size rounding factor once per bar
+        self._size_rfactor = syminfo._size_round_factor
 
         # Check if we're in a new trading day for intraday risk management
         # TradingView tracks intraday based on trading session, not calendar day
@@ -1074,48 +1340,50 @@ class Position:
         script = lib._script
 
         # If the order is open → high → low → close or open → low → high → close
-        ohlc = self.h - self.o < self.o - self.l
+        ohlc = h - o < o - l
 
         self.drawdown_summ = self.runup_summ = 0.0
         self.new_closed_trades.clear()
 
-        exit_orders = list(self.exit_orders.values())
-
         # Skip exit order processing if there's no open position (TradingView behavior)
         if not self.open_trades:
-            # Remove all exit orders when position is flat
-            for order in exit_orders:
+            # Remove all exit orders when position is flat - snapshot the values, as
+            # _remove_order() mutates the dict
+            for order in list(self.exit_orders.values()):
                 self._remove_order(order)
-            exit_orders = []
-
-        # For exit orders, calculate limit/stop from entry price if ticks are specified
-        for order in exit_orders:
-            # Try to find the trade with matching entry_id
-            entry_price = None
-            for trade in self.open_trades:
-                if trade.entry_id == order.order_id:
-                    entry_price = trade.entry_price
-                    break
-
-            # If we found the entry price and have tick values, calculate the actual prices
-            if entry_price is not None:
-                # Determine direction from the order
-                direction = 1.0 if order.size < 0 else -1.0  # Exit order size is negative of position
 
-                # Calculate limit from profit_ticks if specified
-                if order.profit_ticks is not None and order.limit is None:
-                    order.limit = entry_price + direction * syminfo.mintick * order.profit_ticks
-                    order.limit = _price_round(order.limit, direction)
-
-                # Calculate stop from loss_ticks if specified
-                if order.loss_ticks is not None and order.stop is None:
-                    order.stop = entry_price - direction * syminfo.mintick * order.loss_ticks
-                    order.stop = _price_round(order.stop, -direction)
-
-                # Calculate trail_price from trail_points_ticks if specified
-                if order.trail_points_ticks is not None and order.trail_price is None:
-                    order.trail_price = entry_price + direction * syminfo.mintick * order.trail_points_ticks
-                    order.trail_price = _price_round(order.trail_price, direction)
+        # For exit orders, calculate limit/stop from entry price if ticks are specified;
+        # recalculation only touches the orders themselves, so the dict view is iterated
+        # directly without a list copy. Skipped outright when no exit order ever used
+        # tick-based targets.
+        if self._has_tick_exit_orders:
+            for order in self.exit_orders.values():
+                # Try to find the trade with matching entry_id
+                trades = self._trades_by_entry_id.get(order.order_id)
+                entry_price = trades[0].entry_price if trades else None
+
+                # If we found the entry price and have tick values, calculate the actual prices
+                if entry_price is not None:
+                    # Direction is fixed at order creation
+                    direction = order.exit_direction
+
+                    # Calculate limit from profit_ticks if specified
+                    if order.profit_ticks is not None and order.limit is None:
+                        order.limit = entry_price + direction * order._profit_offset
+                        order.limit = _price_round(order.limit, direction)
+
+                    # Calculate stop from loss_ticks if specified
+                    if order.loss_ticks is not None and order.stop is None:
+                        order.stop = entry_price - direction * order._loss_offset
+                        order.stop = _price_round(order.stop, -direction)
+
+                    # Calculate trail_price from trail_points_ticks if specified
+                    if order.trail_points_ticks is not None and order.trail_price is None:
+                        order.trail_price = entry_price + direction * order._trail_points_offset
+                        order.trail_price = _price_round(order.trail_price, direction)
+
+                    # The limit/stop prices may have just been set
+                    order._update_trigger_mask()
 
         # Check for stop/limit orders that should be converted to market orders due to gaps
         # This must happen BEFORE processing market orders
@@ -1128,12 +1396,18 @@ class Position:
                 self.market_orders[order.order_id] = order
 
         # Process Market orders
+        slippage = script.slippage
+        slippage_tick = syminfo.mintick * slippage if slippage > 0 else 0.0
+        # Resolve the sweep direction once: open → high → low → close fills market
+        # orders against (o, l), open → low → high → close against (l, o)
+        mh, ml = (o, l) if ohlc else (l, o)
+
         for order in list(self.market_orders.values()):
             if order.limit is None and order.stop is None:
                 # We need to check pyramiding and flip quantity here for market orders :-/
                 # Check pyramiding limit for entry orders adding to existing position
                 if self.sign == order.sign:
-                    if lib._script.pyramiding <= len(self.open_trades):
+                    if script.pyramiding <= len(self.open_trades):
                         # Pyramiding limit reached - don't add the order
                         self._remove_order(order)
                         continue
@@ -1143,129 +1417,111 @@ class Position:
                     order.size -= self.size  # Subtract because position.size has opposite sign
 
             # Apply slippage to market orders
-            fill_price = self.o
-            if script.slippage > 0:
+            fill_price = o
+            if slippage > 0:
                 # Slippage is in ticks, always adverse to trade direction
                 # For long orders (buying), slippage increases the price
                 # For short orders (selling), slippage decreases the price
-                slippage_amount = syminfo.mintick * script.slippage * order.sign
-                fill_price = self.o + slippage_amount
+                fill_price = o + slippage_tick * order.sign
 
-            # open → high → low → close
-            if ohlc:
-                self.fill_order(order, fill_price, self.o, self.l)
-            # open → low → high → close
-            else:
-                self.fill_order(order, fill_price, self.l, self.o)
+            self.fill_order(order, fill_price, mh, ml)
 
         # Process orders: open → high → low → close
         if ohlc:
-            # open -> high
-            for order in self.orderbook.iter_orders(min_price=self.o, max_price=self.h):
-                if self._check_high_stop(order):
-                    continue
-                if self._check_high(order):
-                    continue
-                if self._check_high_trailing(order):
-                    continue
-                if order.trail_triggered and order.stop is not None:
-                    self._check_close(order, ohlc)
-
-            # open -> low
-            for order in self.orderbook.iter_orders(max_price=self.o, min_price=self.l):
-                if self._check_low_stop(order):
-                    continue
-                if self._check_low(order):
-                    continue
-                if self._check_low_trailing(order):
-                    continue
-                if order.trail_triggered and order.stop is not None:
-                    self._check_close(order, ohlc)
-
+            self._sweep_high(ohlc)
+            self._sweep_low(ohlc)
         # Process orders: open → low → high → close
         else:
-            # open -> low
-            for order in self.orderbook.iter_orders(max_price=self.o, min_price=self.l):
-                if self._check_low_stop(order):
-                    continue
-                if self._check_low(order):
-                    continue
-                if self._check_low_trailing(order):
-                    continue
-                if order.trail_triggered and order.stop is not None:
-                    self._check_close(order, ohlc)
-
-            # open -> high
-            for order in self.orderbook.iter_orders(min_price=self.o, max_price=self.h):
-                if self._check_high_stop(order):
-                    continue
-                if self._check_high(order):
-                    continue
-                if self._check_high_trailing(order):
-                    continue
-                if order.trail_triggered and order.stop is not None:
-                    self._check_close(order, ohlc)
+            self._sweep_low(ohlc)
+            self._sweep_high(ohlc)
 
         # Calculate average entry price, unrealized P&L, drawdown and runup...
         if self.open_trades:
             # Unrealized P&L
             self.openprofit = self.size * (self.c - self.avg_price)
 
+            # Bar prices and average price are loop-invariant; bind them once
+            c = self.c
+            h_avg = self.h - self.avg_price
+            l_avg = self.l - self.avg_price
+
+            # Accumulate the summs in locals; written back once after the loop
+            drawdown_summ = self.drawdown_summ
+            runup_summ = self.runup_summ
+
             # Calculate open drawdowns and runups
             for trade in self.open_trades:
+                size = trade.size
+                commission = trade.commission
+
                 # Profit of trade
-                trade.profit = trade.size * (self.c - trade.entry_price) - 2 * trade.commission
+                trade.profit = size * (c - trade.entry_price) - 2 * commission
 
                 # P/L from high/low to calculate drawdown and runup
-                hprofit = trade.size * (self.h - self.avg_price) - trade.commission
-                lprofit = trade.size * (self.l - self.avg_price) - trade.commission
+                hprofit = size * h_avg - commission
+                lprofit = size * l_avg - commission
+                lo = hprofit if hprofit < lprofit else lprofit
+                hi = lprofit if hprofit < lprofit else hprofit
                 # Drawdown
-                drawdown = -min(hprofit, lprofit, 0.0)
-                trade.max_drawdown = max(drawdown, trade.max_drawdown)
+                drawdown = -lo if lo < 0.0 else 0.0
+                if drawdown > trade.max_drawdown:
+                    trade.max_drawdown = drawdown
                 # Runup
-                runup = max(hprofit, lprofit, 0.0)
-                trade.max_runup = max(runup, trade.max_runup)
+                runup = hi if hi > 0.0 else 0.0
+                if runup > trade.max_runup:
+                    trade.max_runup = runup
 
                 # Calculate percentage values for drawdown and runup
                 # This part is missing in the original code
-                trade_value = abs(trade.size) * trade.entry_price
+                trade_value = abs(size) * trade.entry_price
                 if trade_value > 0:
+                    # One shared division; percentages are then a multiply each
+                    inv_trade_value = 100.0 / trade_value
+
                     # Calculate drawdown percentage
-                    trade.max_drawdown_percent = max(
-                        (drawdown / trade_value) * 100.0 if drawdown > 0 else 0.0,
-                        trade.max_drawdown_percent
-                    )
+                    drawdown_percent = drawdown * inv_trade_value if drawdown > 0 else 0.0
+                    if drawdown_percent > trade.max_drawdown_percent:
+                        trade.max_drawdown_percent = drawdown_percent
 
                     # Calculate runup percentage
-                    trade.max_runup_percent = max(
-                        (runup / trade_value) * 100.0 if runup > 0 else 0.0,
-                        trade.max_runup_percent
-                    )
+                    runup_percent = runup * inv_trade_value if runup > 0 else 0.0
+                    if runup_percent > trade.max_runup_percent:
+                        trade.max_runup_percent = runup_percent
 
                 # Drawdown summ runup summ
-                self.drawdown_summ += drawdown
-                self.runup_summ += runup
+                drawdown_summ += drawdown
+                runup_summ += runup
+
+            self.drawdown_summ = drawdown_summ
+            self.runup_summ = runup_summ
 
         # Calculate max drawdown and runup
         if self.drawdown_summ or self.runup_summ:
-            self.max_drawdown = max(self.max_drawdown, self.max_equity - self.entry_equity + self.drawdown_summ)
-            self.max_runup = max(self.max_runup, self.entry_equity - self.min_equity + self.runup_summ)
+            drawdown = self.max_equity - self.entry_equity + self.drawdown_summ
+            if drawdown > self.max_drawdown:
+                self.max_drawdown = drawdown
+            runup = self.entry_equity - self.min_equity + self.runup_summ
+            if runup > self.max_runup:
+                self.max_runup = runup
 
         # Cumulative stats
         if self.new_closed_trades:
             initial_capital = lib._script.initial_capital
+            # All trades closed on this bar share the same cumulative values;
+            # compute them once instead of per trade
+            cum_profit = self.cum_profit = self.equity - initial_capital - self.openprofit
+            cum_max_drawdown = self.max_drawdown
+            cum_max_runup = self.max_runup
+
+            # Cumulative profit percent
+            # TradingView calculates this as total return on initial capital
+            cum_profit_percent = (cum_profit / initial_capital) * 100.0 if initial_capital else 0.0
+
             for closed_trade in self.new_closed_trades:
-                self.cum_profit = self.equity - lib._script.initial_capital - self.openprofit
-                closed_trade.cum_profit = self.cum_profit
-                closed_trade.cum_max_drawdown = self.max_drawdown
-                closed_trade.cum_max_runup = self.max_runup
-
-                # Cumulative profit percent
-                # TradingView calculates this as total return on initial capital
-                try:
-                    closed_trade.cum_profit_percent = (closed_trade.cum_profit / initial_capital) * 100.0
-                except ZeroDivisionError:
-                    closed_trade.cum_profit_percent = 0.0
+                closed_trade.cum_profit = cum_profit
+                closed_trade.cum_max_drawdown = cum_max_drawdown
+                closed_trade.cum_max_runup = cum_max_runup
+                closed_trade.cum_profit_percent = cum_profit_percent
 
                 # Modify entry equity, for max drawdown and runup
                 self.entry_equity += closed_trade.profit
@@ -1284,9 +1540,60 @@ def _size_round(qty: float) -> float:
     :return: The rounded quantity
     """
     rfactor = syminfo._size_round_factor  # noqa
+    if rfactor == 1:  # Integer-lot instruments just truncate towards zero
+        return float(int(qty))
     qrf = int(abs(qty) * rfactor * 10.0) * 0.1  # We need to floor to one decimal place
-    sign = 1 if qty > 0 else -1
-    return sign * int(qrf) / rfactor
+    return int(qrf) / rfactor if qty > 0 else -int(qrf) / rfactor
+
+
+_qty_fn_cache: dict[tuple, object] = {}
+
+
+def _qty_from_equity_fn(commission_type, commission_value, qty_percent):
+    """
+    Get a function computing the order quantity for a percent-of-equity sizing,
+    specialized for the script's commission settings
+
+    Commission type, commission value and the default qty percentage are constant for
+    a script, so the per-call branch chain and the percentage conversion are resolved
+    once and the resulting closure is memoized.
+
+    :param commission_type: The script's commission type
+    :param commission_value: The script's commission value
+    :param qty_percent: The script's default qty value, in percent of equity
+    :return: Function mapping (equity, point_price) to quantity
+    """
+    try:
+        return _qty_fn_cache[commission_type, commission_value, qty_percent]
+    except KeyError:
+        pass
+
+    equity_percent = qty_percent * 0.01
+
+    if commission_type == _commission.percent:
+        # For percentage commission: qty * price * (1 + commission%)
+        commission_multiplier = 1.0 + commission_value * 0.01
+
+        def fn(equity: float, point_price: float) -> float:
+            return equity * equity_percent / (point_price * commission_multiplier)
+
+    elif commission_type == _commission.cash_per_contract:
+        # For cash per contract: qty * (price + commission_value) = target investment
+        def fn(equity: float, point_price: float) -> float:
+            return equity * equity_percent / (point_price + commission_value)
+
+    elif commission_type == _commission.cash_per_order:
+        # For cash per order: qty = (target investment - commission_value) / price
+        def fn(equity: float, point_price: float) -> float:
+            return max(0.0, (equity * equity_percent - commission_value) / point_price)
+
+    else:
+        # No commission
+        def fn(equity: float, point_price: float) -> float:
+            return equity * equity_percent / point_price
+
+    _qty_fn_cache[commission_type, commission_value, qty_percent] = fn
+    return fn
 
 
 # noinspection PyShadowingNames
@@ -1298,23 +1605,13 @@ def _price_round(price: float | NA[float], direction: int | float) -> float | NA
     :param direction: The direction of the price
     :return:
     """
-    if isinstance(price, NA):
+    if type(price) is NA:  # NA has no subclasses, so this skips the isinstance machinery
         return na_float
     pricescale = syminfo.pricescale
+    # Rounding to 7 decimals first guards against float noise in the scaled price
     pmp = round(cast(float, price * pricescale), 7)
-    pmp_int = int(pmp)
-
-    if direction < 0:
-        # Round down
-        return pmp_int / pricescale
-    else:
-        # Round up only if pmp is not already an integer
-        if pmp == pmp_int:
-            # Already an integer, no rounding needed
-            return pmp_int / pricescale
-        else:
-            # Not an integer, round up
-            return (pmp_int + 1) / pricescale
+    # Round down / up to a whole tick depending on direction
+    return (floor(pmp) if direction < 0 else ceil(pmp)) / pricescale
 
 
 # noinspection PyShadowingBuiltins,PyProtectedMember
@@ -1380,7 +1677,7 @@ def close(id: str, comment: str | NA[str] = na_str, qty: float | NA[float] = na_
     if size == 0.0:
         return
 
-    exit_id = f"Close entry(s) order {id}"
+    exit_id = _close_exit_id_prefix + id
     order = Order(id, size, exit_id=exit_id, order_type=_order_type_close,
                   comment=None if isinstance(comment, NA) else comment,
                   alert_message=None if isinstance(alert_message, NA) else alert_message)
@@ -1464,30 +1761,10 @@ def entry(id: str, direction: direction.Direction, qty: int | float | NA[float]
             # We want: total_cost = equity * percent
             # So: qty = (equity * percent) / (price * (1 + commission_factor))
 
-            equity_percent = default_qty_value * 0.01
-            target_investment = script.position.equity * equity_percent
-
-            # Calculate the commission factor based on commission type
-            if script.commission_type == _commission.percent:
-                # For percentage commission: qty * price * (1 + commission%)
-                commission_multiplier = 1.0 + script.commission_value * 0.01
-                qty = target_investment / (position.c * syminfo.pointvalue * commission_multiplier)
-
-            elif script.commission_type == _commission.cash_per_contract:
-                # For cash per contract: qty * price + qty * commission_value
-                # qty * (price + commission_value) = target_investment
-                price_plus_commission = position.c * syminfo.pointvalue + script.commission_value
-                qty = target_investment / price_plus_commission
-
-            elif script.commission_type == _commission.cash_per_order:
-                # For cash per order: qty * price + commission_value = target_investment
-                # qty = (target_investment - commission_value) / price
-                qty = (target_investment - script.commission_value) / (position.c * syminfo.pointvalue)
-                qty = max(0.0, qty)  # Ensure non-negative
-
-            else:
-                # No commission
-                qty = target_investment / (position.c * syminfo.pointvalue)
+            # The commission handling and percentage conversion are folded into a
+            # closure specialized for the script's settings
+            qty = _qty_from_equity_fn(script.commission_type, script.commission_value, default_qty_value)(
+                script.position.equity, position.c * syminfo.pointvalue)
 
         elif default_qty_type == cash:
             default_qty_value = script.default_qty_value
@@ -1610,6 +1887,8 @@ def exit(id: str, from_entry: str = "",
         profit_ticks = None if isinstance(profit, NA) else profit
         loss_ticks = None if isinstance(loss, NA) else loss
         trail_points_ticks = None if isinstance(trail_points, NA) else trail_points
+        if profit_ticks is not None or loss_ticks is not None or trail_points_ticks is not None:
+            position._has_tick_exit_orders = True
 
         # We need to have limit, stop or both
         if isinstance(limit, NA) and isinstance(stop, NA) and not isinstance(trail_price, NA):
@@ -1674,7 +1953,9 @@ def exit(id: str, from_entry: str = "",
     else:
         # If still no entry order found, we should exit all open trades and open orders
         if not direction:
-            for order in list(position.entry_orders.values()):
+            # _exit() only writes exit orders, so the entry-order view is safe to
+            # iterate without a snapshot
+            for order in position.entry_orders.values():
                 direction = order.sign
                 size = order.size
                 from_entry = order.order_id
@@ -1736,25 +2017,10 @@ def order(id: str, direction: direction.Direction, qty: int | float | NA[float]
 
         elif default_qty_type == percent_of_equity:
             default_qty_value = script.default_qty_value
-            equity_percent = default_qty_value * 0.01
-            target_investment = script.position.equity * equity_percent
-
-            # Calculate the commission factor based on commission type
-            if script.commission_type == _commission.percent:
-                commission_multiplier = 1.0 + script.commission_value * 0.01
-                qty = target_investment / (lib.close * syminfo.pointvalue * commission_multiplier)
-
-            elif script.commission_type == _commission.cash_per_contract:
-                price_plus_commission = lib.close * syminfo.pointvalue + script.commission_value
-                qty = target_investment / price_plus_commission
-
-            elif script.commission_type == _commission.cash_per_order:
-                qty = (target_investment - script.commission_value) / (lib.close * syminfo.pointvalue)
-                qty = max(0.0, qty)  # Ensure non-negative
-
-            else:
-                # No commission
-                qty = target_investment / (lib.close * syminfo.pointvalue)
+            # The commission handling and percentage conversion are folded into a
+            # closure specialized for the script's settings
+            qty = _qty_from_equity_fn(script.commission_type, script.commission_value, default_qty_value)(
+                script.position.equity, lib.close * syminfo.pointvalue)
 
         elif default_qty_type == cash:
             default_qty_value = script.default_qty_value